@@ -0,0 +1,72 @@
+# _ratelimit.py
+# Client-side token-bucket limiter for OpenRouter requests and prompt tokens
+
+import os
+import time
+import functools
+import asyncio
+import threading
+
+class _Bucket:
+    """Token bucket refilled continuously at per_minute / 60 units per second."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Take amount from the bucket and return how long the caller must wait."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= min(amount, self.capacity)
+        return max(0.0, -self.level / self.rate)
+
+class RateLimiter:
+    """
+    Paces requests to stay under requests-per-minute and tokens-per-minute limits.
+    A limit of 0 disables that bucket.
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0):
+        self._requests = _Bucket(rpm) if rpm > 0 else None
+        self._tokens = _Bucket(tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: int) -> float:
+        with self._lock:
+            now = time.monotonic()
+            wait = 0.0
+            if self._requests:
+                wait = max(wait, self._requests.reserve(1, now))
+            if self._tokens:
+                wait = max(wait, self._tokens.reserve(tokens, now))
+            return wait
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """Wait (without blocking the event loop) until a request may be sent."""
+        wait = self._reserve(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self, tokens: int = 0) -> None:
+        """Blocking counterpart of acquire for synchronous callers."""
+        wait = self._reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+def estimate_tokens(text) -> int:
+    """Cheap token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+@functools.lru_cache(maxsize=1)
+def limiter() -> RateLimiter:
+    """
+    Shared limiter, created on first use so limits set in .env are picked up.
+    Limits come from OPENROUTER_RPM / OPENROUTER_TPM (unset = unlimited).
+    """
+    return RateLimiter(
+        rpm=float(os.getenv("OPENROUTER_RPM", 0)),
+        tpm=float(os.getenv("OPENROUTER_TPM", 0))
+    )
@@ -0,0 +1,115 @@
+# analyze_diff.py
+# Explains a code diff and scores its risk with a single OpenRouter request
+
+import json
+import explain_diff
+import risk_score
+import _llm_cache as cache
+from _trivial import classify_trivial
+from _http import API_URL, post_json, loads, parse_json_reply, shared_session, truncate
+from explain_diff import MODEL, postprocess_summary
+
+# System message asking for summary, score and reason in one JSON object
+SYSTEM_PROMPT = """
+You are an expert code reviewer. Analyze the Git diff you are given and do three things:
+1. In one clear, human sentence, explain the main purpose of this change for a pull request summary.
+   Focus on what functionality or behavior is being added, removed, or changed. Avoid repeating code.
+2. Estimate the risk score (from 1 to 10) of this change.
+3. Explain the reasoning for the risk score briefly.
+
+Return your answer as strict JSON only, in the following format:
+{"summary": "<one sentence>", "risk_score": <number>, "reason": "<brief explanation>"}
+"""
+
+def _analysis_prompt(diff_text: str) -> str:
+    return f"### Git Diff:\n{truncate(diff_text)}"
+
+def _parse_analysis(result_text: str):
+    """Parse the model's JSON reply, or return None if it is unusable."""
+    try:
+        data = parse_json_reply(result_text)
+        return {
+            "summary": postprocess_summary(str(data["summary"])),
+            "score": risk_score.parse_score(data["risk_score"]),
+            "reason": str(data["reason"]).strip()
+        }
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def analyze_diff(diff_text: str) -> dict:
+    """
+    Summarize a diff and assess its risk in one API call.
+
+    Returns:
+        Dict with "summary", "score" and "reason" keys
+    """
+    trivial = classify_trivial(diff_text)
+    if trivial:
+        return trivial
+
+    prompt = _analysis_prompt(diff_text)
+
+    cache_key = cache.make_key(MODEL, SYSTEM_PROMPT + prompt)
+    result_text = cache.get(cache_key)
+    from_cache = result_text is not None
+    if not from_cache:
+        payload = {
+            "model": MODEL,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.3,
+            "response_format": {"type": "json_object"}
+        }
+
+        r = post_json(shared_session(), API_URL, payload)
+        if r.status_code != 200:
+            return {
+                "summary": f"[ERROR] {r.status_code}: {r.text}",
+                "score": -1,
+                "reason": f"API Error {r.status_code}: {r.text}"
+            }
+
+        result_text = loads(r.content)["choices"][0]["message"]["content"]
+
+    analysis = _parse_analysis(result_text)
+    if analysis is None:
+        # Model didn't return usable JSON; ask for each part separately
+        return {
+            "summary": explain_diff.summarize_diff(diff_text),
+            **risk_score.get_risk_score(diff_text)
+        }
+
+    if not from_cache:
+        cache.put(cache_key, result_text)
+    return analysis
+
+def summarize_diff(diff_text: str) -> str:
+    """Plain-English summary of a diff (backed by analyze_diff)."""
+    return analyze_diff(diff_text)["summary"]
+
+def get_risk_score(diff_text: str) -> dict:
+    """Risk score and reason for a diff (backed by analyze_diff)."""
+    analysis = analyze_diff(diff_text)
+    return {"score": analysis["score"], "reason": analysis["reason"]}
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 1:
+        # Read diff from file argument
+        with open(sys.argv[1], 'r') as f:
+            diff_text = f.read()
+    elif not sys.stdin.isatty():
+        # Read diff from stdin
+        diff_text = sys.stdin.read()
+    else:
+        print("Usage: python analyze_diff.py <diff_file>  (or pipe a diff on stdin)")
+        sys.exit(1)
+
+    if not diff_text.strip():
+        print("No changes detected in the diff.")
+        sys.exit(0)
+
+    print(json.dumps(analyze_diff(diff_text)))
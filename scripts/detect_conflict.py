@@ -2,99 +2,119 @@
 # Detects and explains merge conflicts using AI
 
 import os
+import functools
 import sys
 import subprocess
-import requests
+import asyncio
 import warnings
-from dotenv import load_dotenv
+import _llm_cache as cache
+
+try:
+    import pygit2
+except ImportError:  # optional; fall back to the git CLI
+    pygit2 = None
+from _http import (API_URL, post_json, post_json_async, loads, parse_json_reply,
+                   auth_headers, shared_session, truncate)
 
 # Suppress urllib3 SSL warnings
 warnings.filterwarnings('ignore', message='urllib3 v2 only supports OpenSSL 1.1.1+')
 
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("Missing OpenRouter API key in .env")
+MODEL = "mistralai/mixtral-8x7b-instruct"
+
+# Each side of a conflict longer than this (~1.5k tokens) is cut to its head and tail
+MAX_SIDE_CHARS = 6000
+
+# Rough character budget per batched request (~6k tokens at ~4 chars/token)
+BATCH_CHAR_BUDGET = 24000
 
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Maximum number of in-flight requests when explaining conflicts concurrently
+MAX_CONCURRENCY = 8
 
-def get_git_status():
-    """Get git status to check for merge conflicts."""
+@functools.lru_cache(maxsize=1)
+def _repo():
+    """Open the enclosing repository with pygit2, or None if unavailable."""
+    if pygit2 is None:
+        return None
     try:
-        result = subprocess.run(['git', 'status', '--porcelain'], 
-                              capture_output=True, text=True, check=True)
-        return result.stdout
-    except subprocess.CalledProcessError:
+        path = pygit2.discover_repository(os.getcwd())
+        return pygit2.Repository(path) if path else None
+    except (pygit2.GitError, KeyError, ValueError):
         return None
 
 def get_conflicted_files():
-    """Get list of files with merge conflicts."""
-    status = get_git_status()
-    if not status:
-        return []
+    """Get list of files with merge conflicts (unmerged index entries)."""
+    repo = _repo()
+    if repo is not None:
+        # Read the conflict entries straight from the index, no subprocess
+        conflicts = repo.index.conflicts
+        if conflicts is None:
+            return []
+        paths = []
+        for ancestor, ours, theirs in conflicts:
+            path = (ours or theirs or ancestor).path
+            if path not in paths:
+                paths.append(path)
+        return paths
     
-    conflicted_files = []
-    for line in status.splitlines():
-        if line.startswith('UU ') or line.startswith('AA '):
-            # UU = both modified, AA = both added
-            filepath = line[3:].strip()
-            conflicted_files.append(filepath)
-    return conflicted_files
-
-def read_conflict_content(filepath):
-    """Read the content of a conflicted file."""
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        return f"Error reading file: {e}"
-
-def extract_conflict_sections(content):
-    """Extract conflict markers and their content."""
-    lines = content.splitlines()
-    conflicts = []
-    current_conflict = None
-    
-    for i, line in enumerate(lines):
-        if line.startswith('<<<<<<< '):
-            # Start of conflict
-            current_conflict = {
-                'start_line': i + 1,
-                'head_branch': line[8:].strip(),
-                'head_content': [],
-                'base_content': [],
-                'merge_content': []
-            }
-        elif line.startswith('======= ') and current_conflict:
-            # Separator between HEAD and merge branch
-            current_conflict['in_merge'] = True
-        elif line.startswith('>>>>>>> ') and current_conflict:
-            # End of conflict
-            current_conflict['merge_branch'] = line[8:].strip()
-            current_conflict['end_line'] = i + 1
-            conflicts.append(current_conflict)
-            current_conflict = None
-        elif current_conflict:
-            # Content inside conflict
-            if hasattr(current_conflict, 'in_merge') and current_conflict.get('in_merge'):
-                current_conflict['merge_content'].append(line)
-            else:
-                current_conflict['head_content'].append(line)
+        result = subprocess.run(['git', 'diff', '--name-only', '--diff-filter=U', '-z'],
+                                capture_output=True, check=True)
+    except (subprocess.CalledProcessError, OSError):
+        return []
     
-    return conflicts
+    # -z separates paths with NUL so names containing spaces/quotes are verbatim
+    return [path.decode('utf-8', errors='surrogateescape')
+            for path in result.stdout.split(b'\0') if path]
 
-def explain_conflict(conflict_data, filepath):
-    """Use AI to explain the merge conflict."""
-    head_content = '\n'.join(conflict_data['head_content'])
-    merge_content = '\n'.join(conflict_data['merge_content'])
+def _is_marker(line, char):
+    """Check whether a line is a 7-character conflict marker made of char."""
+    return line[:7] == char * 7 and line[7:8] in ('', ' ')
+
+def iter_conflicts(filepath):
+    """Lazily yield the conflicts of a file while streaming it line by line.
     
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "https://yourdomain.com",
-        "Content-Type": "application/json"
-    }
+    Only the conflict currently being parsed is held in memory. Undecodable
+    bytes are replaced rather than aborting the scan.
+    """
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        current_conflict = None
+        section = None
+        
+        for i, line in enumerate(f, 1):
+            line = line.rstrip('\r\n')
+            if _is_marker(line, '<'):
+                # Start of conflict
+                current_conflict = {
+                    'start_line': i,
+                    'head_branch': line[8:].strip(),
+                    'head_content': [],
+                    'base_content': [],
+                    'merge_content': []
+                }
+                section = 'head_content'
+            elif current_conflict is None:
+                continue
+            elif _is_marker(line, '|') and section == 'head_content':
+                # Common ancestor section (diff3 conflict style)
+                section = 'base_content'
+            elif _is_marker(line, '=') and section != 'merge_content':
+                # Separator between HEAD and merge branch
+                section = 'merge_content'
+            elif _is_marker(line, '>') and section == 'merge_content':
+                # End of conflict
+                current_conflict['merge_branch'] = line[8:].strip()
+                current_conflict['end_line'] = i
+                yield current_conflict
+                current_conflict = None
+            else:
+                current_conflict[section].append(line)
+
+def _conflict_prompt(conflict_data, filepath):
+    """Build the prompt explaining a single merge conflict."""
+    head_content = truncate('\n'.join(conflict_data['head_content']), MAX_SIDE_CHARS)
+    merge_content = truncate('\n'.join(conflict_data['merge_content']), MAX_SIDE_CHARS)
     
-    prompt = f"""
+    return f"""
 You are an expert Git merge conflict resolver. Analyze this merge conflict and provide:
 1. A clear explanation of what's conflicting
 2. Why the conflict occurred
@@ -111,22 +131,232 @@ Incoming ({conflict_data['merge_branch']}) version:
 
 Provide a concise, actionable explanation.
 """
+
+def _batch_prompt(conflicts, filepath):
+    """Build the prompt explaining several merge conflicts of one file as JSON."""
+    sections = []
+    for i, conflict_data in enumerate(conflicts, 1):
+        head_content = truncate('\n'.join(conflict_data['head_content']), MAX_SIDE_CHARS)
+        merge_content = truncate('\n'.join(conflict_data['merge_content']), MAX_SIDE_CHARS)
+        sections.append(f"""### Conflict {i}
+Lines {conflict_data['start_line']}-{conflict_data['end_line']}
+
+HEAD ({conflict_data['head_branch']}) version:
+{head_content}
+
+Incoming ({conflict_data['merge_branch']}) version:
+{merge_content}
+""")
+    conflicts_text = '\n'.join(sections)
     
+    return f"""
+You are an expert Git merge conflict resolver. For each merge conflict below provide:
+1. A clear explanation of what's conflicting
+2. Why the conflict occurred
+3. Suggestions for resolution
+
+File: {filepath}
+
+{conflicts_text}
+Reply with strict JSON only, in this format:
+{{"explanations": [{{"id": 1, "explanation": "..."}}, {{"id": 2, "explanation": "..."}}]}}
+Each explanation should be concise and actionable.
+"""
+
+def _payload(prompt, json_mode=False):
+    """Build the OpenRouter chat completion payload for a prompt."""
     payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",
+        "model": MODEL,
         "messages": [{"role": "user", "content": prompt}],
         "temperature": 0.3
     }
+    if json_mode:
+        payload["response_format"] = {"type": "json_object"}
+    return payload
+
+def _parse_batch(result):
+    """Map conflict ids to explanations from a batched reply, or None if unparseable."""
+    try:
+        return {int(item["id"]): str(item["explanation"]).strip()
+                for item in parse_json_reply(result)["explanations"]}
+    except (ValueError, KeyError, TypeError):
+        return None
+
+def explain_conflict(conflict_data, filepath):
+    """Use AI to explain the merge conflict."""
+    prompt = _conflict_prompt(conflict_data, filepath)
+    cache_key = cache.make_key(MODEL, prompt)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
 
     try:
-        r = requests.post(API_URL, headers=headers, json=payload)
+        r = post_json(shared_session(), API_URL, _payload(prompt))
         if r.status_code != 200:
             return f"[ERROR] {r.status_code}: {r.text}"
         
-        result = r.json()["choices"][0]["message"]["content"]
-        return result.strip()
+        result = loads(r.content)["choices"][0]["message"]["content"].strip()
+        cache.put(cache_key, result)
+        return result
+    except Exception as e:
+        return f"Error getting AI explanation: {e}"
+
+def chunk_conflicts(conflicts, budget=BATCH_CHAR_BUDGET):
+    """Group conflicts into batches whose combined content fits the budget."""
+    batch = []
+    size = 0
+    for conflict in conflicts:
+        conflict_size = sum(len(line) for line in conflict['head_content']) + \
+                        sum(len(line) for line in conflict['merge_content'])
+        if batch and size + conflict_size > budget:
+            yield batch
+            batch = []
+            size = 0
+        batch.append(conflict)
+        size += conflict_size
+    if batch:
+        yield batch
+
+def explain_conflicts_batch(conflicts, filepath):
+    """Use AI to explain several merge conflicts of one file in a single request.
+    
+    Returns one explanation per conflict, in the same order. Falls back to
+    per-conflict requests if the model's reply cannot be parsed.
+    """
+    if len(conflicts) == 1:
+        return [explain_conflict(conflicts[0], filepath)]
+    
+    prompt = _batch_prompt(conflicts, filepath)
+    cache_key = cache.make_key(MODEL, prompt)
+    result = cache.get(cache_key)
+    from_cache = result is not None
+    if not from_cache:
+        try:
+            r = post_json(shared_session(), API_URL, _payload(prompt, json_mode=True))
+            if r.status_code != 200:
+                return [f"[ERROR] {r.status_code}: {r.text}"] * len(conflicts)
+            
+            result = loads(r.content)["choices"][0]["message"]["content"]
+        except Exception as e:
+            return [f"Error getting AI explanation: {e}"] * len(conflicts)
+    
+    by_id = _parse_batch(result)
+    if by_id is None:
+        # Model didn't return usable JSON; explain each conflict separately
+        return [explain_conflict(conflict, filepath) for conflict in conflicts]
+    if not from_cache:
+        cache.put(cache_key, result)
+    
+    return [by_id[i] if i in by_id else explain_conflict(conflict, filepath)
+            for i, conflict in enumerate(conflicts, 1)]
+
+async def _post_async(session, sem, payload):
+    """POST a payload under the concurrency semaphore and return the reply text."""
+    async with sem:
+        status, text = await post_json_async(session, API_URL, payload)
+    if status != 200:
+        return None, f"[ERROR] {status}: {text}"
+    return loads(text)["choices"][0]["message"]["content"], None
+
+async def _explain_async(session, sem, conflict, filepath):
+    """Async counterpart of explain_conflict."""
+    prompt = _conflict_prompt(conflict, filepath)
+    cache_key = cache.make_key(MODEL, prompt)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    try:
+        result, error = await _post_async(session, sem, _payload(prompt))
     except Exception as e:
         return f"Error getting AI explanation: {e}"
+    if error:
+        return error
+    result = result.strip()
+    cache.put(cache_key, result)
+    return result
+
+async def _explain_batch_async(session, sem, conflicts, filepath):
+    """Async counterpart of explain_conflicts_batch."""
+    if len(conflicts) == 1:
+        return [await _explain_async(session, sem, conflicts[0], filepath)]
+    
+    prompt = _batch_prompt(conflicts, filepath)
+    cache_key = cache.make_key(MODEL, prompt)
+    result = cache.get(cache_key)
+    from_cache = result is not None
+    if not from_cache:
+        try:
+            result, error = await _post_async(session, sem, _payload(prompt, json_mode=True))
+        except Exception as e:
+            return [f"Error getting AI explanation: {e}"] * len(conflicts)
+        if error:
+            return [error] * len(conflicts)
+    
+    by_id = _parse_batch(result)
+    if by_id is not None and not from_cache:
+        cache.put(cache_key, result)
+    by_id = by_id or {}
+    missing = [i for i in range(1, len(conflicts) + 1) if i not in by_id]
+    fallbacks = await asyncio.gather(
+        *[_explain_async(session, sem, conflicts[i - 1], filepath) for i in missing])
+    by_id.update(zip(missing, fallbacks))
+    return [by_id[i] for i in range(1, len(conflicts) + 1)]
+
+def _conflict_header(conflict):
+    """Conflict fields needed for reporting, without the (possibly large) content."""
+    return {key: conflict[key] for key in ('start_line', 'end_line', 'head_branch', 'merge_branch')}
+
+async def run_all(filepaths):
+    """Explain the conflicts of every file concurrently while streaming them from disk.
+    
+    At most MAX_CONCURRENCY batches of conflict content are held at once: the
+    next batch is only read once an in-flight one has finished. No HTTP session
+    is opened unless some file actually contains conflict markers.
+    
+    Args:
+        filepaths: Conflicted file paths
+    
+    Returns:
+        One (filepath, [(conflict header, explanation), ...]) pair per file, in input order
+    """
+    import aiohttp  # only needed here; --test and explain_conflict stay synchronous
+
+    sem = asyncio.Semaphore(MAX_CONCURRENCY)
+    slots = asyncio.Semaphore(MAX_CONCURRENCY)
+    session = None
+    jobs = []
+    
+    async def explain(batch, filepath):
+        try:
+            return await _explain_batch_async(session, sem, batch, filepath)
+        except Exception as e:
+            return [f"Error getting AI explanation: {e}"] * len(batch)
+        finally:
+            slots.release()
+    
+    try:
+        for filepath in filepaths:
+            try:
+                for batch in chunk_conflicts(iter_conflicts(filepath)):
+                    if session is None:
+                        session = aiohttp.ClientSession(headers=auth_headers(),
+                                                        connector=aiohttp.TCPConnector(limit=16))
+                    await slots.acquire()
+                    headers = [_conflict_header(conflict) for conflict in batch]
+                    jobs.append((filepath, headers, asyncio.create_task(explain(batch, filepath))))
+            except OSError:
+                # e.g. deleted on one side of the merge
+                pass
+        
+        explained = {filepath: [] for filepath in filepaths}
+        for filepath, headers, task in jobs:
+            explained[filepath].extend(zip(headers, await task))
+    finally:
+        if session is not None:
+            await session.close()
+    
+    return [(filepath, explained[filepath]) for filepath in filepaths]
 
 def detect_and_explain_conflicts():
     """Main function to detect and explain all merge conflicts."""
@@ -140,23 +370,20 @@ def detect_and_explain_conflicts():
     
     print(f"⚠️  Found {len(conflicted_files)} conflicted file(s):")
     
-    for filepath in conflicted_files:
+    # Stream conflicts from disk and get AI explanations for all files concurrently
+    results = asyncio.run(run_all(conflicted_files))
+    
+    for filepath, explained in results:
         print(f"\n📄 {filepath}")
         print("-" * 50)
         
-        content = read_conflict_content(filepath)
-        conflicts = extract_conflict_sections(content)
-        
-        if not conflicts:
+        if not explained:
             print("   No conflict markers found (may be binary file)")
             continue
         
-        for i, conflict in enumerate(conflicts, 1):
+        for i, (conflict, explanation) in enumerate(explained, 1):
             print(f"\n   Conflict #{i} (lines {conflict['start_line']}-{conflict['end_line']}):")
             print(f"   HEAD ({conflict['head_branch']}) vs {conflict['merge_branch']}")
-            
-            # Get AI explanation
-            explanation = explain_conflict(conflict, filepath)
             print(f"\n   🤖 AI Analysis:")
             print(f"   {explanation}")
             print()
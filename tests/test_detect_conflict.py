@@ -0,0 +1,65 @@
+# test_detect_conflict.py
+# Checks the streaming conflict-marker parser (run: python -m unittest discover tests)
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from detect_conflict import iter_conflicts
+
+class IterConflictsTest(unittest.TestCase):
+
+    def conflicts(self, text, newline="\n"):
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", newline=newline,
+                                         delete=False) as f:
+            f.write(text)
+        self.addCleanup(os.remove, f.name)
+        return list(iter_conflicts(f.name))
+
+    def test_simple_conflict(self):
+        [conflict] = self.conflicts(
+            "before\n<<<<<<< HEAD\nours\n=======\ntheirs\n>>>>>>> feature\nafter\n")
+        self.assertEqual(conflict["start_line"], 2)
+        self.assertEqual(conflict["end_line"], 6)
+        self.assertEqual(conflict["head_branch"], "HEAD")
+        self.assertEqual(conflict["merge_branch"], "feature")
+        self.assertEqual(conflict["head_content"], ["ours"])
+        self.assertEqual(conflict["merge_content"], ["theirs"])
+
+    def test_bare_separator_outside_conflict(self):
+        # e.g. an RST heading underline
+        self.assertEqual(self.conflicts("Title\n=======\ntext\n"), [])
+
+    def test_separator_inside_incoming_side(self):
+        [conflict] = self.conflicts(
+            "<<<<<<< HEAD\nours\n=======\nTitle\n=======\n>>>>>>> feature\n")
+        self.assertEqual(conflict["merge_content"], ["Title", "======="])
+
+    def test_diff3_base_section(self):
+        [conflict] = self.conflicts(
+            "<<<<<<< HEAD\nours\n||||||| base\nbase\n=======\ntheirs\n>>>>>>> feature\n")
+        self.assertEqual(conflict["head_content"], ["ours"])
+        self.assertEqual(conflict["base_content"], ["base"])
+        self.assertEqual(conflict["merge_content"], ["theirs"])
+
+    def test_crlf_line_endings(self):
+        [conflict] = self.conflicts(
+            "<<<<<<< HEAD\nours\n=======\ntheirs\n>>>>>>> feature\n", newline="\r\n")
+        self.assertEqual(conflict["head_content"], ["ours"])
+        self.assertEqual(conflict["merge_content"], ["theirs"])
+        self.assertEqual(conflict["merge_branch"], "feature")
+
+    def test_unterminated_conflict(self):
+        self.assertEqual(self.conflicts("<<<<<<< HEAD\nours\n=======\ntheirs\n"), [])
+
+    def test_several_conflicts(self):
+        found = self.conflicts(
+            "<<<<<<< HEAD\na\n=======\nb\n>>>>>>> x\nmid\n"
+            "<<<<<<< HEAD\nc\n=======\nd\n>>>>>>> y\n")
+        self.assertEqual([c["start_line"] for c in found], [1, 7])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+# test_risk_score.py
+# Checks how model replies are parsed into risk scores (run: python -m unittest discover tests)
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from risk_score import _parse_risk
+
+class ParseRiskTest(unittest.TestCase):
+
+    def test_plain_json(self):
+        self.assertEqual(_parse_risk('{"score": 4, "reason": "small refactor"}'),
+                         {"score": 4, "reason": "small refactor"})
+
+    def test_fenced_json(self):
+        reply = '```json\n{"score": 7, "reason": "touches auth"}\n```'
+        self.assertEqual(_parse_risk(reply), {"score": 7, "reason": "touches auth"})
+
+    def test_json_inside_prose(self):
+        reply = 'Here is my assessment: {"score": 3, "reason": "docs only"} Thanks!'
+        self.assertEqual(_parse_risk(reply)["score"], 3)
+
+    def test_score_out_of_ten_string(self):
+        self.assertEqual(_parse_risk('{"score": "7/10", "reason": "r"}')["score"], 7)
+
+    def test_risk_score_lines(self):
+        reply = "Risk Score: 10 out of 10\nReason: drops a database table"
+        self.assertEqual(_parse_risk(reply),
+                         {"score": 10, "reason": "drops a database table"})
+
+    def test_broken_json_score_field(self):
+        self.assertEqual(_parse_risk('{"score": 5, "reason": "unterminated')["score"], 5)
+
+    def test_unparseable(self):
+        self.assertEqual(_parse_risk("I can't tell."), {"score": -1, "reason": "Not parsed"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# test_trivial.py
+# Checks which diffs _trivial answers locally (run: python -m unittest discover tests)
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+
+from _trivial import classify_trivial
+
+def _diff(path, hunk, section=""):
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1,3 +1,3 @@ {section}\n{hunk}"
+
+class ClassifyTrivialTest(unittest.TestCase):
+
+    def assertNotTrivial(self, diff_text):
+        self.assertIsNone(classify_trivial(diff_text))
+
+    def test_reordered_lines(self):
+        self.assertNotTrivial(_diff("app.py",
+            "-check_auth(user)\n do_sensitive(user)\n+check_auth(user)\n"))
+
+    def test_dedent_out_of_block(self):
+        self.assertNotTrivial(_diff("app.py",
+            " if user.is_admin:\n-    delete_all()\n+delete_all()\n"))
+
+    def test_whitespace_inside_string(self):
+        self.assertNotTrivial(_diff("app.py",
+            '-greeting = "hello world"\n+greeting = "helloworld"\n'))
+
+    def test_line_moved_between_files(self):
+        self.assertNotTrivial(
+            _diff("a.py", "-import os\n import sys\n") +
+            _diff("b.py", "+import os\n import sys\n"))
+
+    def test_blank_lines_and_trailing_whitespace(self):
+        result = classify_trivial(_diff("app.py",
+            " def f():\n-    return 1   \n+    return 1\n+\n"))
+        self.assertEqual(result["score"], 1)
+
+    def test_dependency_bump(self):
+        result = classify_trivial(_diff("requirements.txt",
+            "-requests==2.31.0\n+requests==2.32.3\n"))
+        self.assertEqual(result["score"], 2)
+
+    def test_pyproject_dependency_bump(self):
+        result = classify_trivial(_diff("pyproject.toml",
+            '   "click>=8.0",\n-  "requests>=2.31",\n+  "requests>=2.32",\n ]\n',
+            section="dependencies = ["))
+        self.assertEqual(result["score"], 2)
+
+    def test_optional_dependency_bump(self):
+        self.assertEqual(classify_trivial(_diff("pyproject.toml",
+            ' [project.optional-dependencies]\n dev = [\n-  "pytest~=7.4",\n+  "pytest~=8.0",\n'
+        ))["score"], 2)
+
+    def test_requirements_package_swap(self):
+        self.assertNotTrivial(_diff("requirements.txt", "-boto3==1.0\n+boto2==1.0\n"))
+
+    def test_requirements_operator_change(self):
+        self.assertNotTrivial(_diff("requirements.txt", "-django>=4.2\n+django<4.2\n"))
+
+    def test_pyproject_setting_outside_dependencies(self):
+        self.assertNotTrivial(_diff("pyproject.toml",
+            " [tool.black]\n-line-length = 88\n+line-length = 120\n"))
+        self.assertNotTrivial(_diff("pyproject.toml",
+            "-timeout = 30\n+timeout = 3000\n", section="[tool.pytest.ini_options]"))
+        self.assertNotTrivial(_diff("pyproject.toml",
+            "-fail_under = 90\n+fail_under = 0\n", section="[tool.coverage.report]"))
+
+    def test_pyproject_requirement_outside_dependency_array(self):
+        self.assertNotTrivial(_diff("pyproject.toml",
+            '-  "ruff>=0.1",\n+  "ruff>=0.4",\n', section="extend-select = ["))
+
+    def test_code_change(self):
+        self.assertNotTrivial(_diff("app.py", "-x = 1\n+x = 2\n"))
+
+    def test_shortcuts_disabled(self):
+        with mock.patch.dict(os.environ, {"DIFFUSE_TRIVIAL_SHORTCUTS": "0"}):
+            self.assertNotTrivial(_diff("app.py", "-x = 1   \n+x = 1\n"))
+
+if __name__ == "__main__":
+    unittest.main()
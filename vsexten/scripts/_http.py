@@ -0,0 +1,173 @@
+# _http.py
+# Shared OpenRouter plumbing: API key, pooled session, prompt truncation and
+# JSON POST helpers that send compact, gzip-compressed request bodies
+
+import os
+import re
+import gzip
+import json
+import time
+import random
+import asyncio
+import functools
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from _ratelimit import limiter, estimate_tokens
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+except ImportError:  # fall back to the stdlib encoder
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    loads = json.loads
+
+# A ```json ... ``` block wrapped around a model reply
+_FENCE_RE = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL | re.IGNORECASE)
+
+def parse_json_reply(text: str):
+    """
+    Decode the first JSON object in a model reply, tolerating code fences and
+    surrounding prose. Raises ValueError if there is none.
+    """
+    m = _FENCE_RE.search(text)
+    if m:
+        text = m.group(1)
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("no JSON object in reply")
+    return json.JSONDecoder().raw_decode(text, start)[0]
+
+API_URL = "https://openrouter.ai/api/v1/chat/completions"
+
+# Inputs longer than this (~3k tokens) are cut down to their head and tail
+MAX_PROMPT_CHARS = 12000
+
+HEADERS = {
+    "HTTP-Referer": "https://yourdomain.com",
+    "Content-Type": "application/json"
+}
+
+@functools.lru_cache(maxsize=1)
+def api_key() -> str:
+    """Load the OpenRouter API key on first use rather than at import time."""
+    load_dotenv()
+    key = os.getenv("OPENROUTER_API_KEY")
+    if not key:
+        raise RuntimeError("Missing OpenRouter API key in .env")
+    return key
+
+def auth_headers() -> dict:
+    """Request headers, including the API key."""
+    return {**HEADERS, "Authorization": f"Bearer {api_key()}"}
+
+@functools.lru_cache(maxsize=1)
+def shared_session() -> requests.Session:
+    """
+    Shared HTTP session so repeated calls reuse pooled TCP/TLS connections.
+    The adapter only retries connection errors; post_json retries 429/5xx itself
+    so that every attempt goes through the rate limiter.
+    """
+    session = requests.Session()
+    session.headers.update(auth_headers())
+    session.mount("https://", HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=16,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status=0,
+            respect_retry_after_header=False,
+            allowed_methods=frozenset(["POST"]),
+            raise_on_status=False
+        )
+    ))
+    return session
+
+def truncate(text: str, max_chars: int = MAX_PROMPT_CHARS) -> str:
+    """Keep the head and tail of oversized text so prompt size stays bounded."""
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return text[:half] + "\n...[truncated]...\n" + text[-half:]
+
+# Bodies smaller than this aren't worth compressing
+GZIP_MIN_BYTES = 4096
+
+# Statuses worth retrying, and how often
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_RETRIES = 3
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_GZIP_HEADERS = {"Content-Type": "application/json", "Content-Encoding": "gzip"}
+
+def _encode(payload: dict):
+    """Serialize payload compactly; return (body, headers, plain body if gzipped)."""
+    body = dumps(payload)
+    if len(body) < GZIP_MIN_BYTES:
+        return body, _JSON_HEADERS, None
+    return gzip.compress(body), _GZIP_HEADERS, body
+
+def _gzip_rejected(status: int, text: str) -> bool:
+    """True if the server refused the request because of its Content-Encoding."""
+    if status == 415:
+        return True
+    text = text.lower()
+    return status == 400 and ("gzip" in text or "encoding" in text)
+
+def _backoff(attempt: int, retry_after) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else exponential with jitter."""
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return 0.5 * 2 ** attempt + random.uniform(0, 0.5)
+
+def post_json(session, url: str, payload: dict):
+    """
+    POST payload as JSON with a requests session, gzipping large bodies.
+    If the server rejects the compressed body, it is resent uncompressed.
+    Every attempt, including 429/5xx retries, is paced by the shared rate limiter.
+    """
+    body, headers, plain = _encode(payload)
+    tokens = estimate_tokens(plain or body)
+    for attempt in range(MAX_RETRIES + 1):
+        limiter().acquire_sync(tokens)
+        r = session.post(url, data=body, headers=headers)
+        if plain is not None and _gzip_rejected(r.status_code, r.text):
+            # Server refused the compressed body; resend it as plain JSON
+            body, headers, plain = plain, _JSON_HEADERS, None
+            continue
+        if r.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        time.sleep(_backoff(attempt, r.headers.get("Retry-After")))
+    return r
+
+async def post_json_async(session, url: str, payload: dict):
+    """
+    Async counterpart of post_json for an aiohttp session, with the same retries.
+
+    Returns:
+        (status, response text) tuple
+    """
+    body, headers, plain = _encode(payload)
+    tokens = estimate_tokens(plain or body)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter().acquire(tokens)
+        async with session.post(url, data=body, headers=headers) as r:
+            status, text = r.status, await r.text()
+            retry_after = r.headers.get("Retry-After")
+        if plain is not None and _gzip_rejected(status, text):
+            # Server refused the compressed body; resend it as plain JSON
+            body, headers, plain = plain, _JSON_HEADERS, None
+            continue
+        if status not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        await asyncio.sleep(_backoff(attempt, retry_after))
+    return status, text
@@ -0,0 +1,65 @@
+# _llm_cache.py
+# Persistent on-disk cache of LLM responses, keyed by a hash of model + prompt
+
+import os
+import time
+import functools
+import hashlib
+import sqlite3
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".diffuse", "llm_cache.sqlite")
+
+# Entries older than this many seconds are ignored (override with DIFFUSE_CACHE_TTL)
+DEFAULT_TTL = 7 * 24 * 3600
+
+_conn = None
+
+@functools.lru_cache(maxsize=1)
+def _ttl() -> float:
+    """Read DIFFUSE_CACHE_TTL on first use, falling back to the default if it is invalid."""
+    try:
+        return float(os.getenv("DIFFUSE_CACHE_TTL", DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+def _connection():
+    """Open (once per process) the cache database, creating it if needed."""
+    global _conn
+    if _conn is None:
+        os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+        _conn = sqlite3.connect(CACHE_PATH)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache "
+            "(key TEXT PRIMARY KEY, value TEXT, created REAL)"
+        )
+        _conn.commit()
+    return _conn
+
+def make_key(model: str, prompt: str) -> str:
+    """Build the cache key for a model/prompt pair."""
+    return hashlib.sha256(f"{model}|{prompt}".encode()).hexdigest()
+
+def get(key: str):
+    """Return the cached value for key, or None if missing or expired."""
+    try:
+        row = _connection().execute(
+            "SELECT value, created FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+    if row is None or time.time() - row[1] > _ttl():
+        return None
+    return row[0]
+
+def put(key: str, value: str) -> None:
+    """Store value under key, replacing any previous entry."""
+    try:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+            (key, value, time.time())
+        )
+        conn.commit()
+    except (sqlite3.Error, OSError):
+        pass
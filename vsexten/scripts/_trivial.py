@@ -0,0 +1,112 @@
+# _trivial.py
+# Recognizes mechanical diffs that can be described without calling the LLM
+
+import os
+import re
+
+# Files whose version-only edits count as a dependency bump
+DEPENDENCY_FILES = {"requirements.txt", "pyproject.toml"}
+
+# A version specifier (operator + version); only the version part may change
+_SPECIFIER_RE = re.compile(r'(===|==|~=|!=|>=|<=|<|>)\s*[\w.*+!-]+')
+
+# A requirement line: package name, optional extras, then a version specifier
+_REQUIREMENT_RE = re.compile(r'^["\']?[A-Za-z0-9][\w.-]*(\[[\w.,\s-]*\])?\s*(===|==|~=|!=|>=|<=|<|>)')
+
+# pyproject.toml structure: a [table] header and the opening line of a key = [ array
+_TABLE_RE = re.compile(r'^\[+\s*([^\]]+?)\s*\]+$')
+_ARRAY_RE = re.compile(r'^([\w.-]+)\s*=\s*\[')
+
+def _hunks(diff_text: str):
+    """
+    Split a diff into hunks of (file name, section heading, lines).
+    Each line is a (tag, text) pair where tag is "+", "-" or " " (context).
+    """
+    hunks = []
+    path = None
+    in_header = True
+    for line in diff_text.splitlines():
+        if line.startswith("diff "):
+            in_header = True
+        elif line.startswith("@@"):
+            in_header = False
+            # git puts the nearest enclosing line (e.g. "dependencies = [") after the closing @@
+            hunks.append((path, line.split("@@", 2)[-1].strip(), []))
+        elif in_header:
+            # File markers only appear before the first hunk of each file
+            if line.startswith(("+++ ", "--- ")):
+                name = line[4:].strip()
+                if name != "/dev/null":
+                    path = os.path.basename(name)
+        elif line[:1] in ("+", "-", " "):
+            hunks[-1][2].append((line[:1], line[1:]))
+    return hunks
+
+def _layout_only(hunks) -> bool:
+    """True if every hunk differs only in trailing whitespace or blank lines."""
+    for _, _, lines in hunks:
+        old = [text.rstrip() for tag, text in lines if tag != "+" and text.strip()]
+        new = [text.rstrip() for tag, text in lines if tag != "-" and text.strip()]
+        if old != new:
+            return False
+    return True
+
+def _in_dependency_array(table, array) -> bool:
+    """True if a pyproject.toml array holds requirement strings."""
+    if array in ("dependencies", "requires"):
+        return True
+    return array is not None and table is not None and \
+        table.endswith(("optional-dependencies", "dependency-groups"))
+
+def _version_bump(path, section, lines) -> bool:
+    """True if a hunk only changes the versions of requirement specifiers."""
+    if path not in DEPENDENCY_FILES:
+        return False
+    removed = []
+    added = []
+    table = array = None
+    for tag, text in [(" ", section)] + lines:
+        text = text.strip()
+        if tag != " " and text:
+            in_place = path == "requirements.txt" or _in_dependency_array(table, array)
+            if not in_place or not _REQUIREMENT_RE.match(text):
+                return False
+            masked = "".join(_SPECIFIER_RE.sub(r'\1#', text).split())
+            (added if tag == "+" else removed).append(masked)
+        elif path == "pyproject.toml":
+            # Follow the table/array structure through context lines
+            m = _TABLE_RE.match(text)
+            if m:
+                table, array = m.group(1), None
+                continue
+            m = _ARRAY_RE.match(text)
+            if m:
+                array = m.group(1)
+            if text.rstrip(",").endswith("]"):
+                array = None
+    return bool(removed or added) and removed == added
+
+def classify_trivial(diff_text: str):
+    """
+    Return a canned analysis for a purely mechanical diff, or None.
+
+    The result has the same shape as analyze_diff: "summary", "score", "reason".
+    Set DIFFUSE_TRIVIAL_SHORTCUTS=0 to always use the LLM.
+    """
+    if os.getenv("DIFFUSE_TRIVIAL_SHORTCUTS", "1") == "0":
+        return None
+
+    hunks = _hunks(diff_text)
+    if not any(tag != " " for _, _, lines in hunks for tag, _ in lines):
+        return None
+
+    # Indentation and line order are kept, since both can change behavior
+    if _layout_only(hunks):
+        summary = "Whitespace-only change."
+        return {"summary": summary, "score": 1, "reason": summary}
+
+    if all(_version_bump(*hunk) for hunk in hunks):
+        summary = "Dependency version bump."
+        return {"summary": summary, "score": 2, "reason": summary}
+
+    return None
@@ -1,20 +1,31 @@
 # explain_diff.py
 # Uses OpenRouter API to generate plain-English explanations of code diffs
 
-import os
-import requests
+import re
+import asyncio
 import warnings
-from dotenv import load_dotenv
+import _llm_cache as cache
+from _trivial import classify_trivial
+from _http import (API_URL, post_json, post_json_async, loads,
+                   auth_headers, shared_session, truncate)
 
 # Suppress urllib3 SSL warnings
 warnings.filterwarnings('ignore', message='urllib3 v2 only supports OpenSSL 1.1.1+')
 
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("Missing OpenRouter API key in .env")
+MODEL = "mistralai/mixtral-8x7b-instruct"  # free & smart
 
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Static instructions, sent as the system message so providers can cache the prefix
+SYSTEM_PROMPT = (
+    "You are an expert code reviewer. In one clear, human sentence, explain the main purpose of this code change for a pull request summary. "
+    "Focus on what functionality or behavior is being added, removed, or changed. Avoid repeating code."
+)
+
+# Summary post-processing patterns
+_REPEAT_RE = re.compile(r'(\b\w+\b)(?:\s+\1\b)+', re.IGNORECASE)  # repeated words
+_WS_RE = re.compile(r'\s+')
+
+# Maximum number of in-flight requests when summarizing diffs concurrently
+MAX_CONCURRENCY = 8
 
 def clean_diff(diff_text: str) -> str:
     """
@@ -24,53 +35,115 @@ def clean_diff(diff_text: str) -> str:
     lines = []
     for line in diff_text.splitlines():
         # keep lines starting with + or - (but skip the file markers +++/---)
-        if (line.startswith("+") or line.startswith("-")) and not line.startswith(("+++","---")):
-            code = line[1:].strip()
-            # Remove leading '#' and extra whitespace
-            if code.startswith('#'):
-                code = code[1:].strip()
-            lines.append(code)
+        if not line or line[0] not in "+-" or line[:3] in ("+++", "---"):
+            continue
+        code = line[1:].strip()
+        # Remove leading '#' (trailing whitespace is already gone)
+        if code[:1] == '#':
+            code = code[1:].lstrip()
+        lines.append(code)
     return "\n".join(lines) or diff_text
 
+def _summary_prompt(diff_text: str) -> str:
+    """Build the variable (user) part of the summarization prompt for a raw diff."""
+    cleaned = truncate(clean_diff(diff_text))
+    return f"Code diff:\n{cleaned}"
+
+def _payload(prompt: str) -> dict:
+    """Build the OpenRouter chat completion payload for a prompt."""
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 100  # one sentence; caps decode time
+    }
+
+def postprocess_summary(summary) -> str:
+    """Remove repeated words, collapse whitespace and capitalize the first letter."""
+    if isinstance(summary, str):
+        summary = _REPEAT_RE.sub(r'\1', summary)  # remove repeated words
+        summary = _WS_RE.sub(' ', summary).strip()
+        summary = summary[0].upper() + summary[1:] if summary else summary
+        return summary
+    return str(summary)
+
 def summarize_diff(diff_text: str) -> str:
     """
     Send the cleaned diff to OpenRouter API and return a plain-English summary.
     """
-    cleaned = clean_diff(diff_text)
-    
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "https://yourdomain.com",  # Replace or keep generic
-        "Content-Type": "application/json"
-    }
+    trivial = classify_trivial(diff_text)
+    if trivial:
+        return trivial["summary"]
+
+    prompt = _summary_prompt(diff_text)
     
-    prompt = (
-        "You are an expert code reviewer. In one clear, human sentence, explain the main purpose of this code change for a pull request summary. "
-        "Focus on what functionality or behavior is being added, removed, or changed. Avoid repeating code.\n"
-        f"Code diff:\n{cleaned}"
-    )
+    cache_key = cache.make_key(MODEL, SYSTEM_PROMPT + prompt)
+    summary = cache.get(cache_key)
+    if summary is None:
+        r = post_json(shared_session(), API_URL, _payload(prompt))
+        if r.status_code != 200:
+            return f"[ERROR] {r.status_code}: {r.text}"
+
+        out = loads(r.content)
+        summary = out["choices"][0]["message"]["content"]
+        if isinstance(summary, str):
+            cache.put(cache_key, summary)
     
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",  # free & smart
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
+    return postprocess_summary(summary)
 
-    r = requests.post(API_URL, headers=headers, json=payload)
-    if r.status_code != 200:
-        return f"[ERROR] {r.status_code}: {r.text}"
+async def _post(session, sem, payload: dict):
+    """POST a payload under the concurrency semaphore and return (content, error)."""
+    async with sem:
+        status, text = await post_json_async(session, API_URL, payload)
+    if status != 200:
+        return None, f"[ERROR] {status}: {text}"
+    return loads(text)["choices"][0]["message"]["content"], None
 
-    out = r.json()
-    summary = out["choices"][0]["message"]["content"]
+async def _summarize_async(session, sem, prompt: str) -> str:
+    """Async counterpart of summarize_diff, for an already-built prompt."""
+    cache_key = cache.make_key(MODEL, SYSTEM_PROMPT + prompt)
+    summary = cache.get(cache_key)
+    if summary is None:
+        try:
+            summary, error = await _post(session, sem, _payload(prompt))
+        except Exception as e:
+            return f"[ERROR] {e}"
+        if error:
+            return error
+        if isinstance(summary, str):
+            cache.put(cache_key, summary)
     
-    # Post-process: remove repeated words, collapse whitespace, capitalize first letter
-    if isinstance(summary, str):
-        import re
-        summary = re.sub(r'(\b\w+\b)(?:\s+\1\b)+', r'\1', summary, flags=re.IGNORECASE)  # remove repeated words
-        summary = re.sub(r'\s+', ' ', summary).strip()
-        summary = summary[0].upper() + summary[1:] if summary else summary
-        return summary
-    return str(summary)
+    return postprocess_summary(summary)
+
+async def summarize_diffs(diffs: list) -> list:
+    """
+    Summarize several diffs concurrently over one connection pool.
+    Results are returned in the same order as the input diffs.
+    """
+    # Trivial diffs are answered locally; send each distinct remaining prompt once,
+    # then scatter results back to every position
+    trivial = [classify_trivial(d) for d in diffs]
+    prompts = [None if t else _summary_prompt(d) for d, t in zip(diffs, trivial)]
+    unique = {}
+    for prompt in prompts:
+        if prompt is not None:
+            unique.setdefault(prompt, len(unique))
+
+    results = []
+    if unique:
+        import aiohttp  # only needed for batches; keeps single-diff use dependency-free
+
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        async with aiohttp.ClientSession(headers=auth_headers(), connector=aiohttp.TCPConnector(limit=16)) as session:
+            results = await asyncio.gather(*[_summarize_async(session, sem, p) for p in unique])
+    return [t["summary"] if t else results[unique[p]] for t, p in zip(trivial, prompts)]
+
+def summarize_diff_many(diffs: list) -> list:
+    """Synchronous wrapper around summarize_diffs."""
+    return asyncio.run(summarize_diffs(diffs))
 
 if __name__ == "__main__":
     import sys
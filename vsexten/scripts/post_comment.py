@@ -6,15 +6,7 @@ import requests
 import sys
 import json
 from dotenv import load_dotenv
-from explain_diff import summarize_diff
-from risk_score import get_risk_score
-
-load_dotenv()
-
-# GitHub API configuration
-GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
-GITHUB_REPOSITORY = os.getenv("GITHUB_REPOSITORY")  # format: owner/repo
-GITHUB_PR_NUMBER = os.getenv("GITHUB_PR_NUMBER")
+from analyze_diff import analyze_diff
 
 def post_github_comment(comment_body: str, pr_number: int = None, repo: str = None, token: str = None) -> bool:
     """
@@ -30,9 +22,10 @@ def post_github_comment(comment_body: str, pr_number: int = None, repo: str = No
         True if successful, False otherwise
     """
     # Use provided values or fall back to environment variables
-    pr_number = pr_number or GITHUB_PR_NUMBER
-    repo = repo or GITHUB_REPOSITORY
-    token = token or GITHUB_TOKEN
+    load_dotenv()
+    pr_number = pr_number or os.getenv("GITHUB_PR_NUMBER")
+    repo = repo or os.getenv("GITHUB_REPOSITORY")  # format: owner/repo
+    token = token or os.getenv("GITHUB_TOKEN")
     
     if not all([pr_number, repo, token]):
         print("❌ Missing required GitHub configuration:")
@@ -75,11 +68,10 @@ def format_diff_analysis(diff_text: str) -> str:
     """
     print("🔍 Analyzing diff...")
     
-    # Get AI explanation
-    explanation = summarize_diff(diff_text)
-    
-    # Get risk score
-    risk_data = get_risk_score(diff_text)
+    # Get AI explanation and risk score in one request
+    analysis = analyze_diff(diff_text)
+    explanation = analysis["summary"]
+    risk_data = analysis
     
     # Format the comment
     comment = f"""## 🤖 AI Code Review
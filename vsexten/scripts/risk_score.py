@@ -1,63 +1,152 @@
-import os
-import requests
-from dotenv import load_dotenv
+import re
+import asyncio
+import _llm_cache as cache
+from _trivial import classify_trivial
+from _http import (API_URL, post_json, post_json_async, loads, parse_json_reply,
+                   auth_headers, shared_session, truncate)
 
-load_dotenv()
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-if not OPENROUTER_API_KEY:
-    raise RuntimeError("Missing OpenRouter API key in .env")
+MODEL = "mistralai/mixtral-8x7b-instruct"  # free & smart
 
-API_URL = "https://openrouter.ai/api/v1/chat/completions"
-
-def get_risk_score(diff_text: str) -> dict:
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "HTTP-Referer": "https://yourdomain.com",  # Replace or keep generic
-        "Content-Type": "application/json"
-    }
-
-    prompt = f"""
-You are a code reviewer bot. Analyze the following Git diff and do two things:
+# System message asking for the score and reason as JSON
+SYSTEM_PROMPT = """
+You are a code reviewer bot. Analyze the Git diff you are given and do two things:
 1. Estimate the risk score (from 1 to 10) of this change.
 2. Explain the reasoning briefly.
 
-### Git Diff:
-{diff_text}
-
-Return your answer in the following format:
-Risk Score: <number>
-Reason: <brief explanation>
+Return your answer as strict JSON only, in the following format:
+{"score": <number>, "reason": "<brief explanation>"}
 """
 
-    payload = {
-        "model": "mistralai/mixtral-8x7b-instruct",  # free & smart
-        "messages": [{"role": "user", "content": prompt}],
-        "temperature": 0.3
-    }
+# Fallback patterns for replies that aren't valid JSON
+_SCORE_RE = re.compile(r'(?:Risk Score|"score")\s*:\s*"?(\d+)', re.IGNORECASE)
+_REASON_RE = re.compile(r'Reason:\s*(.*)', re.IGNORECASE)
 
-    response = requests.post(API_URL, headers=headers, json=payload)
+# Leading number of a score given as text, e.g. "7/10"
+_LEADING_INT_RE = re.compile(r'\s*(\d+)')
 
-    if response.status_code != 200:
-        return {
-            "score": -1,
-            "reason": f"API Error {response.status_code}: {response.text}"
-        }
+# Maximum number of in-flight requests when scoring diffs concurrently
+MAX_CONCURRENCY = 8
 
-    result_text = response.json()["choices"][0]["message"]["content"]
+def _risk_prompt(diff_text: str) -> str:
+    return f"### Git Diff:\n{truncate(diff_text)}"
 
+def _payload(prompt: str) -> dict:
+    return {
+        "model": MODEL,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.3,
+        "response_format": {"type": "json_object"}
+    }
+
+def parse_score(value) -> int:
+    """Read a score given as a number or as text such as "7" or "7/10"."""
+    if isinstance(value, str):
+        m = _LEADING_INT_RE.match(value)
+        if m:
+            value = m.group(1)
+    return int(value)
+
+def _parse_risk(result_text: str) -> dict:
+    """Parse the model's reply; the score is -1 if none could be found."""
+    try:
+        data = parse_json_reply(result_text)
+        return {"score": parse_score(data["score"]), "reason": str(data["reason"]).strip()}
+    except (ValueError, KeyError, TypeError):
+        pass
+
+    # Not JSON: fall back to "Risk Score: <n>" / "Reason: <text>" lines
     score = -1
     reason = "Not parsed"
     for line in result_text.splitlines():
-        if "Risk Score" in line:
-            try:
-                score = int(''.join(filter(str.isdigit, line)))
-            except:
-                pass
-        if "Reason" in line:
-            reason = line.split("Reason:", 1)[1].strip()
+        if score == -1:
+            m = _SCORE_RE.search(line)
+            if m:
+                score = int(m.group(1))
+        if reason == "Not parsed":
+            m = _REASON_RE.search(line)
+            if m:
+                reason = m.group(1).strip()
+        if score != -1 and reason != "Not parsed":
+            break
 
     return {"score": score, "reason": reason}
 
+def get_risk_score(diff_text: str) -> dict:
+    trivial = classify_trivial(diff_text)
+    if trivial:
+        return {"score": trivial["score"], "reason": trivial["reason"]}
+
+    prompt = _risk_prompt(diff_text)
+
+    cache_key = cache.make_key(MODEL, SYSTEM_PROMPT + prompt)
+    result_text = cache.get(cache_key)
+    from_cache = result_text is not None
+    if not from_cache:
+        response = post_json(shared_session(), API_URL, _payload(prompt))
+
+        if response.status_code != 200:
+            return {
+                "score": -1,
+                "reason": f"API Error {response.status_code}: {response.text}"
+            }
+
+        result_text = loads(response.content)["choices"][0]["message"]["content"]
+
+    risk = _parse_risk(result_text)
+    if not from_cache and risk["score"] != -1:
+        cache.put(cache_key, result_text)
+    return risk
+
+async def _risk_score_async(session, sem, prompt: str) -> dict:
+    cache_key = cache.make_key(MODEL, SYSTEM_PROMPT + prompt)
+    result_text = cache.get(cache_key)
+    from_cache = result_text is not None
+    if not from_cache:
+        try:
+            async with sem:
+                status, text = await post_json_async(session, API_URL, _payload(prompt))
+        except Exception as e:
+            return {"score": -1, "reason": f"API Error: {e}"}
+
+        if status != 200:
+            return {
+                "score": -1,
+                "reason": f"API Error {status}: {text}"
+            }
+
+        result_text = loads(text)["choices"][0]["message"]["content"]
+
+    risk = _parse_risk(result_text)
+    if not from_cache and risk["score"] != -1:
+        cache.put(cache_key, result_text)
+    return risk
+
+async def get_risk_scores(diffs: list) -> list:
+    """Score several diffs concurrently; results keep the input order."""
+    # Same trivial-shortcut and dedupe scheme as explain_diff.summarize_diffs
+    trivial = [classify_trivial(d) for d in diffs]
+    prompts = [None if t else _risk_prompt(d) for d, t in zip(diffs, trivial)]
+    unique = {}
+    for prompt in prompts:
+        if prompt is not None:
+            unique.setdefault(prompt, len(unique))
+
+    results = []
+    if unique:
+        import aiohttp  # only needed for batched scoring
+
+        sem = asyncio.Semaphore(MAX_CONCURRENCY)
+        async with aiohttp.ClientSession(headers=auth_headers(), connector=aiohttp.TCPConnector(limit=16)) as session:
+            results = await asyncio.gather(*[_risk_score_async(session, sem, p) for p in unique])
+    return [{"score": t["score"], "reason": t["reason"]} if t else dict(results[unique[p]]) for t, p in zip(trivial, prompts)]
+
+def get_risk_score_many(diffs: list) -> list:
+    """Synchronous wrapper around get_risk_scores."""
+    return asyncio.run(get_risk_scores(diffs))
+
 # Demo
 if __name__ == "__main__":
     diff = """diff --git a/auth/login.py b/auth/login.py